@@ -1,24 +1,128 @@
+import logging
 import os
+import threading
 from typing import Optional
 from dotenv import load_dotenv
-from pymongo import MongoClient
+from pymongo import ASCENDING, DESCENDING, TEXT, MongoClient
 from pymongo.database import Database
+from pymongo.errors import PyMongoError
 import certifi
 
+from services.tracing import MongoCommandTracer
+
 
 
 
 
 load_dotenv()
 
-def get_db() -> Database:
-    uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
-    mongo_kwargs = {}
+logger = logging.getLogger(__name__)
+
+_command_tracer = MongoCommandTracer()
+
+# One client per process: MongoClient is thread-safe and owns its connection
+# pool and monitor threads, so it must not be rebuilt on every request.
+_client: Optional[MongoClient] = None
+_client_lock = threading.Lock()
+
 
-    if uri.startswith("mongodb+srv://") or os.getenv("MONGODB_FORCE_CERT", "true").lower() not in {"false", "0", "no"}:
-        # Provide Atlas with a trusted CA bundle when using TLS.
-        mongo_kwargs["tlsCAFile"] = certifi.where()
+def _get_client() -> MongoClient:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                uri = os.getenv("MONGODB_URI", "mongodb://localhost:27017")
+                mongo_kwargs = {}
 
-    client = MongoClient(uri, **mongo_kwargs)
+                if uri.startswith("mongodb+srv://") or os.getenv("MONGODB_FORCE_CERT", "true").lower() not in {"false", "0", "no"}:
+                    # Provide Atlas with a trusted CA bundle when using TLS.
+                    mongo_kwargs["tlsCAFile"] = certifi.where()
+
+                # MongoClient connects lazily; real Mongo time shows up in the command spans.
+                _client = MongoClient(uri, event_listeners=[_command_tracer], **mongo_kwargs)
+    return _client
+
+
+def get_db() -> Database:
     db_name = os.getenv("MONGODB_DB", "ai_article_creator")
-    return client[db_name]
+    return _get_client()[db_name]
+
+
+def _create_index(collection, keys, **options) -> None:
+    # Each index stands alone, so one conflicting definition cannot skip the rest.
+    try:
+        collection.create_index(keys, **options)
+    except PyMongoError:
+        logger.exception("Failed to create index %s on %s", options.get("name", keys), collection.name)
+
+
+def _ensure_ttl_index(db: Database, collection, field: str, name: str, seconds: int) -> None:
+    """
+    Create a TTL index, or retune an existing one with collMod, so changing
+    the configured lifetime takes effect instead of conflicting.
+    """
+    try:
+        existing = collection.index_information().get(name)
+        if existing is None:
+            collection.create_index([(field, ASCENDING)], name=name, expireAfterSeconds=seconds)
+        elif existing.get("expireAfterSeconds") != seconds:
+            db.command("collMod", collection.name, index={"name": name, "expireAfterSeconds": seconds})
+    except PyMongoError:
+        logger.exception("Failed to ensure TTL index %s on %s", name, collection.name)
+
+
+def ensure_indexes(db: Optional[Database] = None) -> None:
+    """
+    Create the indexes the API relies on. Safe to call repeatedly; Mongo
+    treats identical index definitions as a no-op. A failing index is logged
+    and skipped; only an unreachable server raises.
+    """
+    db = db if db is not None else get_db()
+    # Fail fast once rather than waiting out server selection for every index.
+    db.command("ping")
+
+    # Per-user listing sorted by recency (list_articles, tag/status-only search)
+    _create_index(
+        db.articles,
+        [("userId", ASCENDING), ("updatedAt", DESCENDING), ("_id", DESCENDING)],
+        name="user_updated",
+    )
+
+    # Weighted full-text search, prefixed by userId so lookups stay within one user's drafts
+    _create_index(
+        db.articles,
+        [
+            ("userId", ASCENDING),
+            ("title", TEXT),
+            ("tags", TEXT),
+            ("sections.heading", TEXT),
+            ("sections.content", TEXT),
+        ],
+        name="user_article_text",
+        weights={"title": 10, "tags": 6, "sections.heading": 3, "sections.content": 1},
+        default_language="english",
+    )
+
+    # Revision history: one record per article version, section text deduplicated per article in section_blobs
+    _create_index(
+        db.article_revisions,
+        [("articleId", ASCENDING), ("version", DESCENDING)],
+        name="article_version",
+        unique=True,
+    )
+    _create_index(db.section_blobs, [("articleId", ASCENDING)], name="blob_article")
+
+    # Gemini usage: raw ledger expires after the retention window, rollups are kept
+    retention_days = int(os.getenv("USAGE_EVENT_RETENTION_DAYS", "90"))
+    _ensure_ttl_index(db, db.usage_events, "createdAt", "usage_events_ttl", retention_days * 24 * 60 * 60)
+    _create_index(db.usage_events, [("subject", ASCENDING), ("createdAt", DESCENDING)], name="usage_events_subject")
+    _create_index(db.usage_daily, [("subject", ASCENDING), ("day", DESCENDING)], name="usage_daily_subject")
+
+    # Idempotency-Key records are replayable until they expire
+    _ensure_ttl_index(
+        db,
+        db.idempotency_keys,
+        "createdAt",
+        "idempotency_ttl",
+        int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60))),
+    )
@@ -1,10 +1,20 @@
+import logging
 import os
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from db import ensure_indexes
+from middleware.compression import CompressionMiddleware
+from middleware.tracing import TracingMiddleware
 from routes.generate import router as generate_router
 from routes.articles import router as articles_router
 from routes.auth import router as auth_router
+from routes.usage import router as usage_router
+from services.tracing import configure_tracing
+
+configure_tracing()
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI(title="AI Article Creator API", version="1.0.0")
 
@@ -24,14 +34,30 @@ if extra_origins:
         if origin.strip()
     )
 
+# Compress large JSON payloads (full articles, list pages) when the client allows it
+app.add_middleware(CompressionMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=default_origins,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Trace-Id"],
 )
 
+# Outermost, so request spans cover CORS and compression too
+app.add_middleware(TracingMiddleware)
+
+@app.on_event("startup")
+def create_indexes():
+    # Index problems (Mongo unreachable, a conflicting legacy text index) should
+    # not keep the API, and /api/health, from starting.
+    try:
+        ensure_indexes()
+    except Exception:
+        logger.exception("Failed to create MongoDB indexes; search may be unavailable until they exist")
+
 @app.get("/api/health")
 async def health_check():
     return {"ok": True, "message": "AI Article Creator API is running"}
@@ -40,3 +66,4 @@ async def health_check():
 app.include_router(generate_router, prefix="/api", tags=["generate"])
 app.include_router(articles_router, prefix="/api", tags=["articles"])
 app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
+app.include_router(usage_router, prefix="/api", tags=["usage"])
@@ -0,0 +1,181 @@
+import gzip
+import os
+from typing import List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; fall back to gzip only
+    brotli = None
+
+
+_COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/",
+    "application/javascript",
+    "application/xml",
+)
+
+
+def _parse_accept_encoding(header: str) -> List[Tuple[str, float]]:
+    encodings = []
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        encodings.append((token, quality))
+    return encodings
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """Pick the best supported content-coding the client accepts, or None."""
+    accepted = {token: q for token, q in _parse_accept_encoding(accept_encoding)}
+    wildcard = accepted.get("*", 0.0)
+
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for encoding in supported:
+        q = accepted.get(encoding, wildcard)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+class CompressionMiddleware:
+    """
+    Negotiated Brotli/Gzip compression for JSON and text responses.
+
+    Bodies smaller than `minimum_size` are passed through untouched since the
+    framing overhead outweighs the savings. Whenever an encoding is negotiated,
+    strong ETags get it appended ("<tag>-gzip") and Vary gains Accept-Encoding,
+    on 200s and 304s alike, so each representation keeps one stable validator.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: Optional[int] = None,
+        gzip_level: Optional[int] = None,
+        brotli_quality: Optional[int] = None,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size if minimum_size is not None else int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+        self.gzip_level = gzip_level if gzip_level is not None else int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+        self.brotli_quality = brotli_quality if brotli_quality is not None else int(os.getenv("COMPRESSION_BROTLI_QUALITY", "5"))
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for key, value in scope.get("headers", []):
+            if key == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        body_parts = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+
+            if message["type"] == "http.response.start":
+                if message["status"] == 304:
+                    # A 304 must carry the same validator and Vary as the 200 it stands for.
+                    passthrough = True
+                    await send({**message, "headers": _negotiated_headers(message.get("headers", []), encoding)})
+                    return
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            if passthrough:
+                await send(message)
+                return
+
+            if start_message is not None and not self._is_compressible(start_message):
+                passthrough = True
+                await send(start_message)
+                await send(message)
+                return
+
+            body_parts.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(body_parts)
+            await self._send_response(send, start_message, body, encoding)
+
+        await self.app(scope, receive, send_wrapper)
+
+    def _is_compressible(self, start_message) -> bool:
+        if start_message["status"] < 200 or start_message["status"] in (204, 304):
+            return False
+        content_type = ""
+        for key, value in start_message.get("headers", []):
+            if key == b"content-encoding":
+                return False
+            if key == b"content-type":
+                content_type = value.decode("latin-1").lower()
+        return content_type.startswith(_COMPRESSIBLE_TYPES)
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level)
+
+    async def _send_response(self, send, start_message, body: bytes, encoding: str):
+        # The ETag is tagged whenever an encoding was negotiated, even if the body
+        # ends up below the size threshold, so a later 304 always matches it.
+        headers = [
+            (key, value)
+            for key, value in _negotiated_headers(start_message.get("headers", []), encoding)
+            if key != b"content-length"
+        ]
+
+        if len(body) < self.minimum_size:
+            headers.append((b"content-length", str(len(body)).encode("latin-1")))
+            await send({**start_message, "headers": headers})
+            await send({"type": "http.response.body", "body": body})
+            return
+
+        compressed = self._compress(body, encoding)
+        headers.append((b"content-encoding", encoding.encode("latin-1")))
+        headers.append((b"content-length", str(len(compressed)).encode("latin-1")))
+        await send({**start_message, "headers": headers})
+        await send({"type": "http.response.body", "body": compressed})
+
+
+def _tag_etag(value: bytes, encoding: str) -> bytes:
+    if value.startswith(b"W/") or not value.endswith(b'"'):
+        return value
+    return value[:-1] + b"-" + encoding.encode("latin-1") + b'"'
+
+
+def _negotiated_headers(headers, encoding: str):
+    """Tag the ETag with `encoding` and add Accept-Encoding to Vary."""
+    vary = [value for key, value in headers if key == b"vary"]
+    result = [
+        (key, _tag_etag(value, encoding) if key == b"etag" else value)
+        for key, value in headers
+        if key != b"vary"
+    ]
+    result.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+    return result
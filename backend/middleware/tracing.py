@@ -0,0 +1,54 @@
+from services.tracing import current_trace_id, server_span
+
+
+class TracingMiddleware:
+    """
+    Open a server span per HTTP request, continuing an incoming W3C
+    traceparent, and return the trace id in an X-Trace-Id response header.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        carrier = {
+            key.decode("latin-1"): value.decode("latin-1")
+            for key, value in scope.get("headers", [])
+        }
+        method = scope.get("method", "GET")
+        path = scope.get("path", "")
+
+        # Name spans by route template, not raw path, so every article id
+        # does not produce its own span name; the raw path stays in http.target.
+        with server_span(
+            method,
+            carrier,
+            **{"http.method": method, "http.target": path},
+        ) as current:
+            trace_id = current_trace_id()
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    if current is not None:
+                        _name_after_route(current, scope, method)
+                        current.set_attribute("http.status_code", message["status"])
+                    if trace_id:
+                        headers = list(message.get("headers", []))
+                        headers.append((b"x-trace-id", trace_id.encode("latin-1")))
+                        message = {**message, "headers": headers}
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
+
+
+def _name_after_route(current, scope, method: str) -> None:
+    # Routing stores the matched route in the shared scope.
+    route = scope.get("route")
+    template = getattr(route, "path", None)
+    if template:
+        current.update_name(f"{method} {template}")
+        current.set_attribute("http.route", template)
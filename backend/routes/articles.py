@@ -1,20 +1,47 @@
 from datetime import datetime
+from typing import Optional
 
 from bson import ObjectId
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Request, Response
+from pymongo import ReturnDocument
 
 from db import get_db
 from schemas import ArticleCreateRequest, ArticleUpdateRequest
 from services.auth import get_current_user
+from services.http_cache import (
+    article_etag,
+    article_list_etag,
+    etag_matches,
+    not_modified,
+    set_cache_headers,
+)
+from services.idempotency import run_idempotent
+from services.profiling import InstrumentedRoute
+from services.revisions import (
+    build_revision,
+    delete_revisions,
+    ensure_baseline_revision,
+    list_revisions,
+    record_revision,
+)
+from services.search import search_articles
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
+
+# Just enough of an article to compute its ETag without reading section bodies.
+_VALIDATOR_PROJECTION = {"_id": 1, "version": 1, "updatedAt": 1}
 
 @router.post("/articles")
-def create_article(req: ArticleCreateRequest, current_user: dict = Depends(get_current_user)):
+def create_article(
+    req: ArticleCreateRequest,
+    current_user: dict = Depends(get_current_user),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
     """
     Save a new article draft to MongoDB.
     
     Body: Article data (title, tone, audience, topics, tags, sections, status)
+    Headers: Idempotency-Key (optional) - retries with the same key return the original article ID
     Returns: Article ID
     """
     db = get_db()
@@ -24,6 +51,14 @@ def create_article(req: ArticleCreateRequest, current_user: dict = Depends(get_c
     except Exception as exc:
         raise HTTPException(status_code=400, detail="Invalid user identifier") from exc
 
+    return run_idempotent(
+        idempotency_key,
+        f"articles:create:{owner_id}",
+        req,
+        lambda commit: _insert_article(db, req, owner_id, commit),
+    )
+
+def _insert_article(db, req: ArticleCreateRequest, owner_id: ObjectId, commit) -> dict:
     additional_prompt = (req.additionalPrompt.strip() if req.additionalPrompt else None)
 
     doc = {
@@ -35,37 +70,103 @@ def create_article(req: ArticleCreateRequest, current_user: dict = Depends(get_c
         "tags": req.tags or [],
         "sections": req.sections or [],
         "status": req.status or "draft",
+        "version": 1,
         "userId": owner_id,
         "createdAt": datetime.utcnow(),
         "updatedAt": datetime.utcnow(),
     }
     result = db.articles.insert_one(doc)
-    return {"_id": str(result.inserted_id)}
+    response = {"_id": str(result.inserted_id)}
+    # The article exists now; a retry must get this id back, not insert another.
+    commit(response)
+    record_revision(db, doc)
+    return response
+
+@router.get("/articles/search")
+def search(
+    q: Optional[str] = None,
+    tags: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user),
+):
+    """
+    Search the current user's articles by text, tags and status.
+    
+    Query params:
+        - q: Free-text query over title, tags, section headings and content
+        - tags: Comma-separated tags that must all be present
+        - status: Exact status filter (e.g. "draft")
+        - limit: Max number of results (default 20, max 50)
+        - cursor: Opaque cursor from a previous response's nextCursor
+    
+    Returns: Ranked article summaries and a nextCursor for the following page
+    """
+    db = get_db()
+    try:
+        owner_id = ObjectId(current_user["_id"])
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail="Invalid user identifier") from exc
+
+    try:
+        return search_articles(db, owner_id, q=q, tags=tags, status=status, limit=limit, cursor=cursor)
+    except HTTPException:
+        raise
+    except Exception:
+        raise HTTPException(status_code=500, detail="Failed to search articles")
 
 @router.get("/articles/{id}")
-def get_article(id: str, current_user: dict = Depends(get_current_user)):
+def get_article(
+    id: str,
+    request: Request,
+    response: Response,
+    current_user: dict = Depends(get_current_user),
+):
     """
     Retrieve an article by ID.
     
+    Honors If-None-Match: returns 304 with no body when the article is unchanged.
+    
     Returns: Full article document
     """
     db = get_db()
     try:
         owner_id = ObjectId(current_user["_id"])
-        doc = db.articles.find_one({"_id": ObjectId(id), "userId": owner_id})
+        query = {"_id": ObjectId(id), "userId": owner_id}
+
+        # Conditional requests check the validator first so a 304 never reads section bodies.
+        if request.headers.get("if-none-match"):
+            validator = db.articles.find_one(query, _VALIDATOR_PROJECTION)
+            if not validator:
+                raise HTTPException(status_code=404, detail="Article not found")
+            etag = article_etag(validator)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+
+        doc = db.articles.find_one(query)
         if not doc:
             raise HTTPException(status_code=404, detail="Article not found")
+        set_cache_headers(response, article_etag(doc))
         doc["_id"] = str(doc["_id"])
         if doc.get("userId"):
             doc["userId"] = str(doc["userId"])
         return doc
+    except HTTPException:
+        raise
     except Exception as e:
         if "invalid" in str(e).lower():
             raise HTTPException(status_code=400, detail="Invalid article ID")
         raise HTTPException(status_code=500, detail="Failed to retrieve article")
 
 @router.get("/articles")
-def list_articles(limit: int = 20, skip: int = 0, current_user: dict = Depends(get_current_user)):
+def list_articles(
+    request: Request,
+    response: Response,
+    limit: int = 20,
+    skip: int = 0,
+    current_user: dict = Depends(get_current_user),
+):
     """
     List all articles with pagination.
     
@@ -73,20 +174,34 @@ def list_articles(limit: int = 20, skip: int = 0, current_user: dict = Depends(g
         - limit: Max number of articles to return (default 20)
         - skip: Number of articles to skip (default 0)
     
+    Honors If-None-Match: returns 304 with no body when the page is unchanged.
+    
     Returns: List of articles
     """
     db = get_db()
     try:
         owner_id = ObjectId(current_user["_id"])
-        cursor = (
-            db.articles
-            .find({"userId": owner_id})
-            .sort("updatedAt", -1)
-            .skip(skip)
-            .limit(limit)
-        )
+
+        def page(projection=None):
+            return list(
+                db.articles
+                .find({"userId": owner_id}, projection)
+                .sort([("updatedAt", -1), ("_id", -1)])
+                .skip(skip)
+                .limit(limit)
+            )
+
+        # Conditional requests check the validators first so a 304 never reads section bodies.
+        if request.headers.get("if-none-match"):
+            etag = article_list_etag(page(_VALIDATOR_PROJECTION), limit, skip)
+            if etag_matches(request, etag):
+                return not_modified(etag)
+
+        docs = page()
+        set_cache_headers(response, article_list_etag(docs, limit, skip))
+
         articles = []
-        for doc in cursor:
+        for doc in docs:
             doc["_id"] = str(doc["_id"])
             if doc.get("userId"):
                 doc["userId"] = str(doc["userId"])
@@ -111,11 +226,21 @@ def update_article(id: str, req: ArticleUpdateRequest, current_user: dict = Depe
     
     try:
         owner_id = ObjectId(current_user["_id"])
-        result = db.articles.update_one({"_id": ObjectId(id), "userId": owner_id}, {"$set": update})
-        if result.matched_count == 0:
+
+        # Articles saved before versioning have no history yet; keep their current text.
+        legacy = db.articles.find_one({"_id": ObjectId(id), "userId": owner_id, "version": {"$exists": False}})
+        if legacy:
+            ensure_baseline_revision(db, legacy)
+
+        # Read back the exact state this write produced, so its version is recorded once.
+        doc = db.articles.find_one_and_update(
+            {"_id": ObjectId(id), "userId": owner_id},
+            {"$set": update, "$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not doc:
             raise HTTPException(status_code=404, detail="Article not found")
-        
-        doc = db.articles.find_one({"_id": ObjectId(id)})
+        record_revision(db, doc)
         doc["_id"] = str(doc["_id"])
         if doc.get("userId"):
             doc["userId"] = str(doc["userId"])
@@ -140,6 +265,7 @@ def delete_article(id: str, current_user: dict = Depends(get_current_user)):
         result = db.articles.delete_one({"_id": ObjectId(id), "userId": owner_id})
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Article not found")
+        delete_revisions(db, ObjectId(id), owner_id)
         return {"message": "Article deleted successfully"}
     except HTTPException:
         raise
@@ -147,3 +273,73 @@ def delete_article(id: str, current_user: dict = Depends(get_current_user)):
         if "invalid" in str(e).lower():
             raise HTTPException(status_code=400, detail="Invalid article ID")
         raise HTTPException(status_code=500, detail="Failed to delete article")
+
+@router.get("/articles/{id}/revisions")
+def get_revisions(id: str, current_user: dict = Depends(get_current_user)):
+    """
+    List the stored revisions of an article, newest first.
+    
+    Returns: Revision summaries (version, title, status, createdAt, changedSections, sectionCount)
+    """
+    db = get_db()
+    try:
+        owner_id = ObjectId(current_user["_id"])
+        return {"revisions": list_revisions(db, ObjectId(id), owner_id)}
+    except Exception as e:
+        if "invalid" in str(e).lower():
+            raise HTTPException(status_code=400, detail="Invalid article ID")
+        raise HTTPException(status_code=500, detail="Failed to list revisions")
+
+@router.get("/articles/{id}/revisions/{version}")
+def get_revision(id: str, version: int, current_user: dict = Depends(get_current_user)):
+    """
+    Retrieve an article as it was at a given revision.
+    
+    Returns: Article metadata and sections for that version
+    """
+    db = get_db()
+    try:
+        owner_id = ObjectId(current_user["_id"])
+        return {"revision": build_revision(db, ObjectId(id), owner_id, version)}
+    except HTTPException:
+        raise
+    except Exception as e:
+        if "invalid" in str(e).lower():
+            raise HTTPException(status_code=400, detail="Invalid article ID")
+        raise HTTPException(status_code=500, detail="Failed to retrieve revision")
+
+@router.post("/articles/{id}/revisions/{version}/restore")
+def restore_revision(id: str, version: int, current_user: dict = Depends(get_current_user)):
+    """
+    Restore an article to a previous revision.
+    
+    The restored content is saved as a new version, so the restore itself can be undone.
+    
+    Returns: Updated article
+    """
+    db = get_db()
+    try:
+        owner_id = ObjectId(current_user["_id"])
+        restored = build_revision(db, ObjectId(id), owner_id, version)
+        update = {field: restored[field] for field in restored if field not in ("version", "createdAt")}
+        update["updatedAt"] = datetime.utcnow()
+
+        # Read back the exact state this write produced, so its version is recorded once.
+        doc = db.articles.find_one_and_update(
+            {"_id": ObjectId(id), "userId": owner_id},
+            {"$set": update, "$inc": {"version": 1}},
+            return_document=ReturnDocument.AFTER,
+        )
+        if not doc:
+            raise HTTPException(status_code=404, detail="Article not found")
+        record_revision(db, doc)
+        doc["_id"] = str(doc["_id"])
+        if doc.get("userId"):
+            doc["userId"] = str(doc["userId"])
+        return doc
+    except HTTPException:
+        raise
+    except Exception as e:
+        if "invalid" in str(e).lower():
+            raise HTTPException(status_code=400, detail="Invalid article ID")
+        raise HTTPException(status_code=500, detail="Failed to restore revision")
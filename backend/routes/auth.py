@@ -3,6 +3,7 @@ from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
 
 from schemas import Token, UserCreate, UserLogin, UserResponse
+from services.profiling import InstrumentedRoute
 from services.auth import (
     authenticate_user,
     create_access_token,
@@ -12,7 +13,7 @@ from services.auth import (
     get_user_collection,
 )
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
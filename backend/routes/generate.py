@@ -1,11 +1,21 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException
 from schemas import GenerateRequest, SectionRegenerateRequest
+from services.auth import get_optional_user
 from services.gemini import generate_article_with_gemini, regenerate_section_with_gemini
+from services.idempotency import run_idempotent
+from services.profiling import InstrumentedRoute
+from services.usage import metered_gemini_call, usage_subject, usage_subjects
 
-router = APIRouter()
+router = APIRouter(route_class=InstrumentedRoute)
 
 @router.post("/generate")
-def generate(req: GenerateRequest):
+def generate(
+    req: GenerateRequest,
+    current_user: Optional[dict] = Depends(get_optional_user),
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
     """
     Generate a new article using Gemini AI.
     
@@ -16,26 +26,36 @@ def generate(req: GenerateRequest):
         - topics: List of topics to cover (optional)
         - apiKey: User's Gemini API key (required)
     
+    Headers:
+        - Idempotency-Key: Optional; retries with the same key replay the first result
+    
     Returns:
         - article: Generated article with title, tags, and sections
     """
-    try:
-        article = generate_article_with_gemini(
-            api_key=req.apiKey,
-            title=req.title,
-            tone=req.tone,
-            audience=req.audience,
-            topics=req.topics,
-            additional_prompt=req.additionalPrompt,
-        )
+    subject = usage_subject(current_user, req.apiKey)
+
+    def run(commit):
+        with metered_gemini_call(usage_subjects(current_user, req.apiKey), "generate") as usage:
+            article = generate_article_with_gemini(
+                api_key=req.apiKey,
+                title=req.title,
+                tone=req.tone,
+                audience=req.audience,
+                topics=req.topics,
+                additional_prompt=req.additionalPrompt,
+                usage=usage,
+            )
         return {"article": article}
+
+    try:
+        return run_idempotent(idempotency_key, f"generate:{subject}", req, run)
     except HTTPException as e:
         raise e
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate article: {str(e)}")
 
 @router.post("/section/regenerate")
-def regenerate_section(req: SectionRegenerateRequest):
+def regenerate_section(req: SectionRegenerateRequest, current_user: Optional[dict] = Depends(get_optional_user)):
     """
     Regenerate a specific section of an article.
     
@@ -49,12 +69,14 @@ def regenerate_section(req: SectionRegenerateRequest):
         - section: Regenerated section
     """
     try:
-        section = regenerate_section_with_gemini(
-            api_key=req.apiKey,
-            article=req.article,
-            section_id=req.sectionId,
-            prompt_overrides=req.promptOverrides
-        )
+        with metered_gemini_call(usage_subjects(current_user, req.apiKey), "regenerate_section") as usage:
+            section = regenerate_section_with_gemini(
+                api_key=req.apiKey,
+                article=req.article,
+                section_id=req.sectionId,
+                prompt_overrides=req.promptOverrides,
+                usage=usage,
+            )
         return {"section": section}
     except HTTPException as e:
         raise e
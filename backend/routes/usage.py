@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends
+
+from services.auth import get_current_user
+from services.profiling import InstrumentedRoute
+from services.usage import get_usage_summary, usage_subject
+
+router = APIRouter(route_class=InstrumentedRoute)
+
+
+@router.get("/usage")
+def read_usage(days: int = 30, current_user: dict = Depends(get_current_user)):
+    """
+    Gemini token usage for the current user.
+    
+    Query params:
+        - days: Number of days of daily rollups to return (default 30)
+    
+    Returns: Daily rollups, totals over the window and quota limits
+    """
+    return get_usage_summary(usage_subject(current_user, ""), days=days)
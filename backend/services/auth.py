@@ -13,11 +13,13 @@ from passlib.context import CryptContext
 
 
 from db import get_db
+from services.tracing import span
 
 load_dotenv()
 
 _pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 _oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+_optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
 
 _JWT_SECRET = os.getenv("JWT_SECRET", "change-this-secret")
 _JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
@@ -68,6 +70,11 @@ def authenticate_user(email: str, password: str):
 
 
 def get_current_user(token: str = Depends(_oauth2_scheme)):
+    with span("auth.get_current_user"):
+        return _resolve_user(token)
+
+
+def _resolve_user(token: str):
     payload = decode_access_token(token)
     user_id = payload.get("sub")
     if not user_id:
@@ -84,3 +91,14 @@ def get_current_user(token: str = Depends(_oauth2_scheme)):
     user["_id"] = str(user["_id"])
     user.pop("passwordHash", None)
     return user
+
+
+def get_optional_user(token: Optional[str] = Depends(_optional_oauth2_scheme)):
+    """Resolve the current user from a valid bearer token, otherwise None."""
+    if not token:
+        return None
+    try:
+        return get_current_user(token)
+    except HTTPException:
+        # An expired or invalid token must not block anonymous-capable endpoints.
+        return None
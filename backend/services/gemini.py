@@ -1,14 +1,26 @@
 import json
 import os
+import time
 import requests
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from fastapi import HTTPException
 import google.generativeai as genai
 
-def _call_gemini_rest_api(api_key: str, prompt: str, max_tokens: int = 8192) -> str:
+from services.tracing import inject_trace_headers, span
+from services.usage import UsageRecorder
+
+def _call_gemini_rest_api(
+    api_key: str,
+    prompt: str,
+    max_tokens: int = 8192,
+    usage: Optional[UsageRecorder] = None,
+) -> str:
     """
     Call Gemini API using REST endpoint directly.
     This bypasses SDK limitations and works better with proxies.
+    
+    When `usage` is given, the call's token counts (from usageMetadata) and
+    latency are recorded against it.
     """
     url = f"https://generativelanguage.googleapis.com/v1beta/models/gemini-2.5-flash:generateContent?key={api_key}"
     
@@ -42,39 +54,53 @@ def _call_gemini_rest_api(api_key: str, prompt: str, max_tokens: int = 8192) ->
         proxies["http"] = http_proxy
         proxies["https"] = http_proxy  # Use HTTP proxy for both
     
-    try:
-        response = requests.post(
-            url, 
-            headers=headers, 
-            json=payload, 
-            proxies=proxies if proxies else None,
-            timeout=120
-        )
+    with span("gemini.request", **{"gemini.max_tokens": max_tokens}) as current:
+        inject_trace_headers(headers)
+        started = time.perf_counter()
+        try:
+            response = requests.post(
+                url, 
+                headers=headers, 
+                json=payload, 
+                proxies=proxies if proxies else None,
+                timeout=120
+            )
+            latency_ms = (time.perf_counter() - started) * 1000
+            if current is not None:
+                current.set_attribute("http.status_code", response.status_code)
         
-        if response.status_code == 200:
-            result = response.json()
-            if "candidates" in result and len(result["candidates"]) > 0:
-                content = result["candidates"][0]["content"]["parts"][0]["text"]
-                return content
+            if response.status_code == 200:
+                result = response.json()
+                if usage is not None:
+                    usage.record(result.get("usageMetadata"), latency_ms)
+                if "candidates" in result and len(result["candidates"]) > 0:
+                    content = result["candidates"][0]["content"]["parts"][0]["text"]
+                    return content
+                else:
+                    raise Exception("No content in Gemini response")
+
+            if usage is not None:
+                usage.record(None, latency_ms, ok=False)
+
+            if response.status_code == 400:
+                error_data = response.json()
+                error_msg = error_data.get("error", {}).get("message", "Unknown error")
+                if "location" in error_msg.lower() or "region" in error_msg.lower():
+                    raise HTTPException(
+                        status_code=400,
+                        detail="Geographic restriction detected. Solutions: 1) Use VPN (connect to US/EU) 2) Set proxy: export HTTPS_PROXY=http://proxy:port 3) Deploy backend in supported region. More info: https://ai.google.dev/gemini-api/docs/available-regions"
+                    )
+                raise HTTPException(status_code=400, detail=error_msg)
+            elif response.status_code == 401 or response.status_code == 403:
+                raise HTTPException(status_code=401, detail="Invalid Gemini API key")
+            elif response.status_code == 429:
+                raise HTTPException(status_code=429, detail="Rate limit exceeded")
             else:
-                raise Exception("No content in Gemini response")
-        elif response.status_code == 400:
-            error_data = response.json()
-            error_msg = error_data.get("error", {}).get("message", "Unknown error")
-            if "location" in error_msg.lower() or "region" in error_msg.lower():
-                raise HTTPException(
-                    status_code=400,
-                    detail="Geographic restriction detected. Solutions: 1) Use VPN (connect to US/EU) 2) Set proxy: export HTTPS_PROXY=http://proxy:port 3) Deploy backend in supported region. More info: https://ai.google.dev/gemini-api/docs/available-regions"
-                )
-            raise HTTPException(status_code=400, detail=error_msg)
-        elif response.status_code == 401 or response.status_code == 403:
-            raise HTTPException(status_code=401, detail="Invalid Gemini API key")
-        elif response.status_code == 429:
-            raise HTTPException(status_code=429, detail="Rate limit exceeded")
-        else:
-            raise HTTPException(status_code=response.status_code, detail=f"API error: {response.text}")
-    except requests.exceptions.RequestException as e:
-        raise HTTPException(status_code=500, detail=f"Network error calling Gemini API: {str(e)}")
+                raise HTTPException(status_code=response.status_code, detail=f"API error: {response.text}")
+        except requests.exceptions.RequestException as e:
+            if usage is not None:
+                usage.record(None, (time.perf_counter() - started) * 1000, ok=False)
+            raise HTTPException(status_code=500, detail=f"Network error calling Gemini API: {str(e)}")
 
 def generate_article_with_gemini(
     api_key: str,
@@ -83,6 +109,7 @@ def generate_article_with_gemini(
     audience: str | None,
     topics: List[str] | None,
     additional_prompt: str | None = None,
+    usage: Optional[UsageRecorder] = None,
 ) -> Dict[str, Any]:
     """
     Generate a Medium-style article using Google Gemini API.
@@ -93,6 +120,7 @@ def generate_article_with_gemini(
         tone: Writing tone (informative, persuasive, casual, professional)
         audience: Target audience description
         topics: List of key topics/points to cover
+        usage: Optional recorder for token/latency accounting
     
     Returns:
         Dict with structure: { title, tags, sections: [{id, heading, content, order}] }
@@ -102,21 +130,22 @@ def generate_article_with_gemini(
     
     try:
         # Build the prompt
-        tone_text = tone or "neutral and informative"
-        audience_text = f" for {audience}" if audience else ""
-        topics_text = ""
-        if topics and len(topics) > 0:
-            topics_list = "\n".join([f"- {t}" for t in topics])
-            topics_text = f"\n\nKey topics to cover:\n{topics_list}"
+        with span("gemini.build_prompt"):
+            tone_text = tone or "neutral and informative"
+            audience_text = f" for {audience}" if audience else ""
+            topics_text = ""
+            if topics and len(topics) > 0:
+                topics_list = "\n".join([f"- {t}" for t in topics])
+                topics_text = f"\n\nKey topics to cover:\n{topics_list}"
 
-        narrative_text = ""
-        if additional_prompt:
-            narrative_text = (
-                "\n\nAdditional narrative guidance from the author (use this to shape the storytelling voice, structure, and details):\n"
-                f"{additional_prompt.strip()}\n"
-            )
+            narrative_text = ""
+            if additional_prompt:
+                narrative_text = (
+                    "\n\nAdditional narrative guidance from the author (use this to shape the storytelling voice, structure, and details):\n"
+                    f"{additional_prompt.strip()}\n"
+                )
 
-        prompt = f"""You are an expert Medium article writer known for producing long-form, insightful, and well-structured content. Write a complete, polished Medium-style article using the following specifications:
+            prompt = f"""You are an expert Medium article writer known for producing long-form, insightful, and well-structured content. Write a complete, polished Medium-style article using the following specifications:
 
 Title: {title}
 Tone: {tone_text}
@@ -151,19 +180,20 @@ Requirements:
 """
 
         # Use REST API for better proxy/region support
-        response_text = _call_gemini_rest_api(api_key, prompt, max_tokens=8192)
+        response_text = _call_gemini_rest_api(api_key, prompt, max_tokens=8192, usage=usage)
         
-        # Clean up response if it's wrapped in markdown code blocks
-        if response_text.startswith("```json"):
-            response_text = response_text[7:]
-        if response_text.startswith("```"):
-            response_text = response_text[3:]
-        if response_text.endswith("```"):
-            response_text = response_text[:-3]
-        response_text = response_text.strip()
+        with span("gemini.parse_response"):
+            # Clean up response if it's wrapped in markdown code blocks
+            if response_text.startswith("```json"):
+                response_text = response_text[7:]
+            if response_text.startswith("```"):
+                response_text = response_text[3:]
+            if response_text.endswith("```"):
+                response_text = response_text[:-3]
+            response_text = response_text.strip()
         
-        # Parse JSON response
-        article_data = json.loads(response_text)
+            # Parse JSON response
+            article_data = json.loads(response_text)
         
         # Validate structure
         if "title" not in article_data or "sections" not in article_data:
@@ -199,7 +229,8 @@ def regenerate_section_with_gemini(
     api_key: str,
     article: Dict[str, Any],
     section_id: str,
-    prompt_overrides: Dict[str, Any] | None = None
+    prompt_overrides: Dict[str, Any] | None = None,
+    usage: Optional[UsageRecorder] = None,
 ) -> Dict[str, Any]:
     """
     Regenerate a specific section of an article.
@@ -209,6 +240,7 @@ def regenerate_section_with_gemini(
         article: Full article object
         section_id: ID of the section to regenerate
         prompt_overrides: Optional overrides like tone, length, focus
+        usage: Optional recorder for token/latency accounting
     
     Returns:
         Updated section dict
@@ -223,13 +255,14 @@ def regenerate_section_with_gemini(
             raise HTTPException(status_code=404, detail="Section not found.")
         
         # Build context and prompt
-        overrides = prompt_overrides or {}
-        tone = overrides.get("tone", article.get("tone", "neutral"))
-        focus = overrides.get("focus", "")
+        with span("gemini.build_prompt"):
+            overrides = prompt_overrides or {}
+            tone = overrides.get("tone", article.get("tone", "neutral"))
+            focus = overrides.get("focus", "")
         
-        focus_text = f"\nSpecial focus: {focus}" if focus else ""
+            focus_text = f"\nSpecial focus: {focus}" if focus else ""
         
-        prompt = f"""Rewrite this article section with improvements:
+            prompt = f"""Rewrite this article section with improvements:
 
 Article Title: {article.get('title')}
 Section Heading: {section.get('heading')}
@@ -241,7 +274,7 @@ Tone: {tone}
 Rewrite this section to be more engaging and informative. Return ONLY the new content text, no JSON, no markdown code blocks, just the paragraph text."""
         
         # Use REST API for better proxy/region support
-        new_content = _call_gemini_rest_api(api_key, prompt, max_tokens=4096)
+        new_content = _call_gemini_rest_api(api_key, prompt, max_tokens=4096, usage=usage)
         
         # Return updated section
         return {
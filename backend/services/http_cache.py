@@ -0,0 +1,67 @@
+import hashlib
+from datetime import datetime
+from typing import Iterable, Optional
+
+from fastapi import Request, Response
+
+# Suffixes appended to strong ETags by the compression middleware.
+_ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def _timestamp(value) -> str:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value or "")
+
+
+def article_etag(doc: dict) -> str:
+    """
+    Build a strong ETag for a single article from its id, version and updatedAt.
+    """
+    raw = f"{doc.get('_id')}:{doc.get('version', 0)}:{_timestamp(doc.get('updatedAt'))}"
+    return f'"{hashlib.sha1(raw.encode("utf-8")).hexdigest()}"'
+
+
+def article_list_etag(docs: Iterable[dict], *parts) -> str:
+    """
+    Build a strong ETag for a page of articles from each article's validator
+    plus any extra parts that affect the page (pagination params, etc.).
+    """
+    digest = hashlib.sha1()
+    for part in parts:
+        digest.update(f"{part}|".encode("utf-8"))
+    for doc in docs:
+        digest.update(article_etag(doc).encode("utf-8"))
+    return f'"{digest.hexdigest()}"'
+
+
+def _normalize_etag(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    if tag.endswith('"'):
+        for suffix in _ENCODING_SUFFIXES:
+            if tag.endswith(suffix + '"'):
+                tag = tag[: -len(suffix) - 1] + '"'
+                break
+    return tag
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Weak comparison of the request's If-None-Match header against `etag`."""
+    header: Optional[str] = request.headers.get("if-none-match")
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    target = _normalize_etag(etag)
+    return any(_normalize_etag(candidate) == target for candidate in header.split(","))
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "private, no-cache"})
+
+
+def set_cache_headers(response: Response, etag: str) -> None:
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "private, no-cache"
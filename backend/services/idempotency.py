@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Any, Callable, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from pymongo.errors import DuplicateKeyError
+
+from db import get_db
+
+load_dotenv()
+
+# How long a completed response is kept for replay (enforced by a TTL index).
+IDEMPOTENCY_TTL_SECONDS = int(os.getenv("IDEMPOTENCY_TTL_SECONDS", str(24 * 60 * 60)))
+# After this long an in-flight original is presumed dead and a retry may take over.
+_LOCK_TIMEOUT_SECONDS = int(os.getenv("IDEMPOTENCY_LOCK_TIMEOUT_SECONDS", "150"))
+# How long a retry blocks a worker thread waiting on the original before answering 409.
+_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "5"))
+_POLL_INTERVAL_SECONDS = 0.25
+_MAX_KEY_LENGTH = 255
+
+
+def _request_hash(payload: Any) -> str:
+    canonical = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _replay(record: dict) -> JSONResponse:
+    return JSONResponse(
+        status_code=record.get("statusCode", 200),
+        content=json.loads(record["body"]),
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def _claim(collection, record_id: str, request_hash: str, owner: str) -> Optional[dict]:
+    """
+    Try to become the owner of `record_id`. Returns None when claimed,
+    otherwise the existing record.
+    """
+    now = datetime.utcnow()
+    try:
+        collection.insert_one({
+            "_id": record_id,
+            "status": "pending",
+            "requestHash": request_hash,
+            "owner": owner,
+            "lockedAt": now,
+            "createdAt": now,
+        })
+        return None
+    except DuplicateKeyError:
+        return collection.find_one({"_id": record_id})
+
+
+def _complete(collection, record_id: str, owner: str, status_code: int, result: Any) -> None:
+    # Filtering on owner keeps a superseded original from overwriting the
+    # result of whoever took over its stale lock.
+    collection.update_one(
+        {"_id": record_id, "owner": owner, "status": "pending"},
+        {
+            "$set": {
+                "status": "completed",
+                "statusCode": status_code,
+                "body": json.dumps(jsonable_encoder(result)),
+                "createdAt": datetime.utcnow(),
+            }
+        },
+    )
+
+
+def _wait_for_completion(collection, record_id: str, request_hash: str, owner: str) -> Optional[dict]:
+    """
+    Briefly wait for the original request to finish. Returns the completed
+    record, or None if this caller took ownership (original vanished or its
+    lock went stale). Raises 409 with Retry-After if the original is still
+    running, rather than holding a worker thread for the whole Gemini call.
+    """
+    deadline = time.monotonic() + _WAIT_SECONDS
+    while True:
+        record = collection.find_one({"_id": record_id})
+        if record is None:
+            # Original failed and released the key; retry as the owner.
+            record = _claim(collection, record_id, request_hash, owner)
+            if record is None:
+                return None
+        if record.get("status") == "completed":
+            return record
+
+        stale_before = datetime.utcnow() - timedelta(seconds=_LOCK_TIMEOUT_SECONDS)
+        if record.get("lockedAt") and record["lockedAt"] < stale_before:
+            taken = collection.update_one(
+                {"_id": record_id, "status": "pending", "lockedAt": record["lockedAt"]},
+                {"$set": {"lockedAt": datetime.utcnow(), "owner": owner}},
+            )
+            if taken.modified_count:
+                return None
+
+        if time.monotonic() >= deadline:
+            raise HTTPException(
+                status_code=409,
+                detail="A request with this Idempotency-Key is still in progress",
+                headers={"Retry-After": str(max(1, int(_WAIT_SECONDS)))},
+            )
+        time.sleep(_POLL_INTERVAL_SECONDS)
+
+
+def run_idempotent(
+    key: Optional[str],
+    scope: str,
+    payload: Any,
+    handler: Callable[[Callable[[Any], None]], Any],
+    status_code: int = 200,
+):
+    """
+    Execute `handler` at most once per (scope, Idempotency-Key).
+
+    The first request stores its response; retries with the same key replay
+    it, and concurrent retries briefly wait for the original, then get 409
+    with Retry-After. Reusing a key with a different payload is rejected with
+    422.
+
+    `handler` receives a `commit(result)` callback. Handlers with durable side
+    effects call it as soon as the side effect lands, so the key is kept (and
+    `result` replayed) even if later work fails. A handler that fails before
+    committing releases the key so the client can retry. Without a key,
+    `handler` simply runs.
+    """
+    if not key:
+        return handler(lambda result: None)
+
+    key = key.strip()
+    if not key or len(key) > _MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Invalid Idempotency-Key header")
+
+    collection = get_db().idempotency_keys
+    record_id = f"{scope}:{key}"
+    request_hash = _request_hash(payload)
+    owner = uuid.uuid4().hex
+
+    existing = _claim(collection, record_id, request_hash, owner)
+    if existing is not None:
+        if existing.get("requestHash") != request_hash:
+            raise HTTPException(
+                status_code=422,
+                detail="Idempotency-Key was already used with a different request body",
+            )
+        completed = _wait_for_completion(collection, record_id, request_hash, owner)
+        if completed is not None:
+            return _replay(completed)
+
+    committed = False
+
+    def commit(result: Any) -> None:
+        nonlocal committed
+        _complete(collection, record_id, owner, status_code, result)
+        committed = True
+
+    try:
+        result = handler(commit)
+    except BaseException:
+        if not committed:
+            collection.delete_one({"_id": record_id, "status": "pending", "owner": owner})
+        raise
+
+    if not committed:
+        _complete(collection, record_id, owner, status_code, result)
+    return result
@@ -0,0 +1,159 @@
+import cProfile
+import contextvars
+import functools
+import inspect
+import os
+import pstats
+import random
+import threading
+import time
+from datetime import datetime
+from typing import Callable, List, Optional
+
+from dotenv import load_dotenv
+from fastapi.routing import APIRoute
+
+from services.tracing import current_trace_id, span
+
+load_dotenv()
+
+# Fraction of requests run under cProfile; 0 disables profiling.
+_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+# Only sampled requests slower than this (end to end, dependencies included) are written to disk.
+_THRESHOLD_MS = float(os.getenv("PROFILE_THRESHOLD_MS", "1000"))
+_PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+
+
+class _RequestProfile:
+    """Collects the cProfile runs of one sampled request across worker threads."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.profiles: List[cProfile.Profile] = []
+        self._lock = threading.Lock()
+
+    def add(self, profiler: cProfile.Profile) -> None:
+        with self._lock:
+            self.profiles.append(profiler)
+
+
+_active_profile: contextvars.ContextVar[Optional[_RequestProfile]] = contextvars.ContextVar(
+    "active_profile", default=None
+)
+
+
+def _run_profiled(func: Callable, args, kwargs):
+    request_profile = _active_profile.get()
+    if request_profile is None:
+        return func(*args, **kwargs)
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # Another profiler is already active on this thread.
+        return func(*args, **kwargs)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        profiler.disable()
+        request_profile.add(profiler)
+
+
+def _dump(request_profile: _RequestProfile, name: str, elapsed_ms: float) -> None:
+    if not request_profile.profiles:
+        return
+    os.makedirs(_PROFILE_DIR, exist_ok=True)
+    stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S%f")
+    trace_id = current_trace_id() or "notrace"
+    filename = f"{stamp}-{name}-{int(elapsed_ms)}ms-{trace_id}.prof"
+    stats = pstats.Stats(*request_profile.profiles)
+    stats.dump_stats(os.path.join(_PROFILE_DIR, filename))
+
+
+def profiled(endpoint: Callable) -> Callable:
+    """
+    Wrap a sync endpoint in a handler span and, when the current request was
+    sampled, in cProfile. The wrapper runs in the worker thread alongside the
+    endpoint, which is where the Mongo and Gemini work happens.
+    """
+    if inspect.iscoroutinefunction(endpoint):
+        return endpoint
+
+    name = endpoint.__name__
+
+    @functools.wraps(endpoint)
+    def wrapper(*args, **kwargs):
+        with span(f"handler.{name}"):
+            return _run_profiled(endpoint, args, kwargs)
+
+    return wrapper
+
+
+_dependency_wrappers = {}
+
+
+def _profiled_dependency(call: Callable) -> Callable:
+    # One wrapper per function, so FastAPI's per-request dependency cache still matches.
+    wrapper = _dependency_wrappers.get(call)
+    if wrapper is None:
+        @functools.wraps(call)
+        def wrapper(*args, **kwargs):
+            return _run_profiled(call, args, kwargs)
+
+        _dependency_wrappers[call] = wrapper
+    return wrapper
+
+
+def _instrument_dependencies(dependant) -> None:
+    for sub in dependant.dependencies:
+        call = sub.call
+        # Only plain sync functions run in the threadpool; leave coroutines,
+        # generators and callable instances (security schemes) untouched.
+        if (
+            inspect.isfunction(call)
+            and not inspect.iscoroutinefunction(call)
+            and not inspect.isgeneratorfunction(call)
+        ):
+            sub.call = _profiled_dependency(call)
+        _instrument_dependencies(sub)
+
+
+class InstrumentedRoute(APIRoute):
+    """
+    APIRoute whose endpoint is traced and eligible for sampled profiling.
+
+    A PROFILE_SAMPLE_RATE share of requests is sampled when the route starts
+    handling them. Sync dependencies (e.g. get_current_user) and the endpoint
+    each run under cProfile in their worker thread; the runs are merged into a
+    single .prof dump in PROFILE_DIR when the whole request, including
+    dependency solving and response serialization, took longer than
+    PROFILE_THRESHOLD_MS. Open dumps with pstats or snakeviz.
+    """
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+        _instrument_dependencies(self.dependant)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+        name = self.name
+
+        async def instrumented_handler(request):
+            if not _SAMPLE_RATE or random.random() >= _SAMPLE_RATE:
+                return await handler(request)
+
+            request_profile = _RequestProfile()
+            token = _active_profile.set(request_profile)
+            try:
+                return await handler(request)
+            finally:
+                _active_profile.reset(token)
+                elapsed_ms = (time.perf_counter() - request_profile.started) * 1000
+                if elapsed_ms >= _THRESHOLD_MS:
+                    try:
+                        _dump(request_profile, name, elapsed_ms)
+                    except OSError:
+                        pass
+
+        return instrumented_handler
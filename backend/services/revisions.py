@@ -0,0 +1,152 @@
+import hashlib
+import json
+from datetime import datetime
+from typing import Any, Dict, List
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo import UpdateOne
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+# Article fields captured alongside the section manifest in each revision.
+_META_FIELDS = ("title", "tone", "audience", "topics", "tags", "status", "additionalPrompt")
+
+
+def _section_hash(section: Dict[str, Any]) -> str:
+    """Hash only a section's text, so reordering or renumbering never creates new blobs."""
+    body = {"heading": section.get("heading"), "content": section.get("content")}
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+def _blob_id(article_id: ObjectId, digest: str) -> str:
+    # Blobs are scoped to one article so they can be dropped with it.
+    return f"{article_id}:{digest}"
+
+
+def _store_sections(db: Database, article_id: ObjectId, sections: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Store each section's text as a content-addressed blob and return the
+    manifest: one {id, order, hash} entry per section, in article order.
+    Unchanged sections hash to an existing blob, so they cost nothing to re-store.
+    """
+    manifest = []
+    blobs = {}
+    for section in sections:
+        digest = _section_hash(section)
+        manifest.append({"id": section.get("id"), "order": section.get("order"), "hash": digest})
+        blobs[digest] = {"heading": section.get("heading"), "content": section.get("content")}
+
+    if blobs:
+        now = datetime.utcnow()
+        db.section_blobs.bulk_write(
+            [
+                UpdateOne(
+                    {"_id": _blob_id(article_id, digest)},
+                    {"$setOnInsert": {"articleId": article_id, **body, "createdAt": now}},
+                    upsert=True,
+                )
+                for digest, body in blobs.items()
+            ],
+            ordered=False,
+        )
+    return manifest
+
+
+def record_revision(db: Database, doc: dict) -> None:
+    """
+    Append a revision for the exact article state in `doc`.
+
+    The revision stores article metadata plus the section manifest; section
+    text lives in `section_blobs`, written only when new. Callers must pass the
+    document their own write produced (e.g. from find_one_and_update), so each
+    version is recorded exactly once.
+    """
+    article_id = doc["_id"]
+    version = doc.get("version", 0)
+    manifest = _store_sections(db, article_id, doc.get("sections") or [])
+
+    previous = db.article_revisions.find_one(
+        {"articleId": article_id, "version": {"$lt": version}},
+        {"sections.hash": 1},
+        sort=[("version", -1)],
+    )
+    previous_hashes = {entry["hash"] for entry in previous.get("sections", [])} if previous else set()
+
+    revision = {
+        "articleId": article_id,
+        "userId": doc.get("userId"),
+        "version": version,
+        "sections": manifest,
+        "changedSections": [entry["id"] for entry in manifest if entry["hash"] not in previous_hashes],
+        "createdAt": doc.get("updatedAt") or datetime.utcnow(),
+    }
+    revision.update({field: doc.get(field) for field in _META_FIELDS})
+    db.article_revisions.insert_one(revision)
+
+
+def ensure_baseline_revision(db: Database, doc: dict) -> None:
+    """Record the current state of an article created before revisions existed."""
+    if db.article_revisions.find_one({"articleId": doc["_id"]}, {"_id": 1}) is not None:
+        return
+    try:
+        record_revision(db, doc)
+    except DuplicateKeyError:
+        # A concurrent update already recorded the same baseline.
+        pass
+
+
+def delete_revisions(db: Database, article_id: ObjectId, owner_id: ObjectId) -> None:
+    """Remove an article's revision history and the section blobs it references."""
+    db.article_revisions.delete_many({"articleId": article_id, "userId": owner_id})
+    db.section_blobs.delete_many({"articleId": article_id})
+
+
+def list_revisions(db: Database, article_id: ObjectId, owner_id: ObjectId) -> List[dict]:
+    cursor = (
+        db.article_revisions
+        .find(
+            {"articleId": article_id, "userId": owner_id},
+            {"_id": 0, "version": 1, "title": 1, "status": 1, "createdAt": 1, "changedSections": 1, "sections.hash": 1},
+        )
+        .sort("version", -1)
+    )
+    revisions = []
+    for revision in cursor:
+        revision["sectionCount"] = len(revision.pop("sections", []))
+        revisions.append(revision)
+    return revisions
+
+
+def build_revision(db: Database, article_id: ObjectId, owner_id: ObjectId, version: int) -> Dict[str, Any]:
+    """
+    Rebuild the article as it was at `version` by resolving its section manifest.
+
+    Returns: Article fields (metadata and sections) for that version
+    """
+    revision = db.article_revisions.find_one({"articleId": article_id, "userId": owner_id, "version": version})
+    if not revision:
+        raise HTTPException(status_code=404, detail="Revision not found")
+
+    manifest = revision.get("sections", [])
+    blob_ids = list({_blob_id(article_id, entry["hash"]) for entry in manifest})
+    blobs = {blob["_id"]: blob for blob in db.section_blobs.find({"_id": {"$in": blob_ids}})}
+
+    sections = []
+    for entry in manifest:
+        blob = blobs.get(_blob_id(article_id, entry["hash"]))
+        if blob is None:
+            raise HTTPException(status_code=500, detail="Revision content is incomplete")
+        sections.append({
+            "id": entry.get("id"),
+            "heading": blob.get("heading"),
+            "content": blob.get("content"),
+            "order": entry.get("order"),
+        })
+
+    article = {field: revision.get(field) for field in _META_FIELDS}
+    article["sections"] = sections
+    article["version"] = revision["version"]
+    article["createdAt"] = revision.get("createdAt")
+    return article
@@ -0,0 +1,153 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from bson import ObjectId
+from fastapi import HTTPException
+from pymongo.database import Database
+
+# Fields returned for each search hit; full section bodies stay on the server.
+_SUMMARY_PROJECTION = {
+    "_id": 1,
+    "title": 1,
+    "tags": 1,
+    "status": 1,
+    "tone": 1,
+    "audience": 1,
+    "createdAt": 1,
+    "updatedAt": 1,
+    "sectionCount": {"$size": {"$ifNull": ["$sections", []]}},
+}
+
+MAX_SEARCH_LIMIT = 50
+# Results reachable through text-mode pagination; bounds the per-page top-k sort.
+MAX_TEXT_MATCHES = 500
+
+
+def encode_cursor(data: Dict[str, Any]) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        return json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail="Invalid search cursor") from exc
+
+
+def _parse_tags(tags: Optional[str]) -> List[str]:
+    if not tags:
+        return []
+    return [tag.strip() for tag in tags.split(",") if tag.strip()]
+
+
+def _serialize(doc: dict) -> dict:
+    doc["_id"] = str(doc["_id"])
+    return doc
+
+
+def search_articles(
+    db: Database,
+    owner_id: ObjectId,
+    q: Optional[str] = None,
+    tags: Optional[str] = None,
+    status: Optional[str] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Search one user's articles.
+
+    With `q`, hits are ranked by weighted text score using the userId-prefixed
+    text index; without it, matches are ordered by updatedAt. `nextCursor`
+    encodes the last hit's sort key.
+
+    Without `q` the cursor seeks directly into the (userId, updatedAt) index.
+    With `q`, text scores are not indexable: Mongo scores every match on
+    every page before the cursor filter applies, so later pages re-scan the
+    whole match set. The ranked window is capped at MAX_TEXT_MATCHES, which
+    bounds the sort to a top-k and the number of reachable results.
+
+    Returns: { results: [summary], nextCursor: str | None }
+    """
+    limit = max(1, min(limit, MAX_SEARCH_LIMIT))
+    query = (q or "").strip()
+
+    match: Dict[str, Any] = {"userId": owner_id}
+    tag_list = _parse_tags(tags)
+    if tag_list:
+        match["tags"] = {"$all": tag_list}
+    if status:
+        match["status"] = status
+
+    after = decode_cursor(cursor) if cursor else None
+    after_id = after_score = after_updated = None
+
+    if after is not None:
+        # A cursor must carry the sort key of the current mode; one from the
+        # other mode (or a tampered one) is rejected rather than misread.
+        try:
+            after_id = ObjectId(after["id"])
+            if query:
+                after_score = float(after["score"])
+            else:
+                after_updated = datetime.fromisoformat(after["updatedAt"])
+        except Exception as exc:
+            raise HTTPException(status_code=400, detail="Invalid search cursor") from exc
+
+    if query:
+        match["$text"] = {"$search": query}
+        pipeline: List[Dict[str, Any]] = [
+            {"$match": match},
+            {"$addFields": {"score": {"$meta": "textScore"}}},
+            # Keep only the best-scoring window so deep result sets stay bounded.
+            {"$sort": {"score": -1, "_id": -1}},
+            {"$limit": MAX_TEXT_MATCHES},
+        ]
+        if after is not None:
+            pipeline.append({
+                "$match": {
+                    "$or": [
+                        {"score": {"$lt": after_score}},
+                        {"score": after_score, "_id": {"$lt": after_id}},
+                    ]
+                }
+            })
+        pipeline += [
+            {"$sort": {"score": -1, "_id": -1}},
+            {"$limit": limit + 1},
+            {"$project": {**_SUMMARY_PROJECTION, "score": 1}},
+        ]
+    else:
+        if after is not None:
+            match["$or"] = [
+                {"updatedAt": {"$lt": after_updated}},
+                {"updatedAt": after_updated, "_id": {"$lt": after_id}},
+            ]
+        pipeline = [
+            {"$match": match},
+            {"$sort": {"updatedAt": -1, "_id": -1}},
+            {"$limit": limit + 1},
+            {"$project": _SUMMARY_PROJECTION},
+        ]
+
+    docs = list(db.articles.aggregate(pipeline))
+    has_more = len(docs) > limit
+    docs = docs[:limit]
+
+    next_cursor = None
+    if has_more and docs:
+        last = docs[-1]
+        if query:
+            next_cursor = encode_cursor({"score": last["score"], "id": str(last["_id"])})
+        else:
+            updated_at = last.get("updatedAt")
+            next_cursor = encode_cursor({
+                "updatedAt": updated_at.isoformat() if isinstance(updated_at, datetime) else updated_at,
+                "id": str(last["_id"]),
+            })
+
+    return {"results": [_serialize(doc) for doc in docs], "nextCursor": next_cursor}
@@ -0,0 +1,134 @@
+import os
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, MutableMapping, Optional
+
+from dotenv import load_dotenv
+from pymongo import monitoring
+
+try:
+    from opentelemetry import propagate, trace
+    from opentelemetry.sdk.resources import Resource
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    from opentelemetry.sdk.trace.sampling import ParentBased, TraceIdRatioBased
+except ImportError:  # tracing is optional; spans become no-ops
+    trace = None
+
+load_dotenv()
+
+_configured = False
+
+
+def configure_tracing() -> None:
+    """
+    Install the tracer provider selected by TRACING_EXPORTER:
+        - none (default): spans are not recorded
+        - file: JSON lines appended to TRACING_FILE
+        - otlp: OTLP/HTTP export to OTEL_EXPORTER_OTLP_ENDPOINT
+    """
+    global _configured
+    exporter_name = os.getenv("TRACING_EXPORTER", "none").lower()
+    if _configured or trace is None or exporter_name == "none":
+        return
+
+    if exporter_name == "otlp":
+        from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        exporter = OTLPSpanExporter()
+    else:
+        path = os.getenv("TRACING_FILE", "traces/spans.jsonl")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        exporter = ConsoleSpanExporter(
+            out=open(path, "a", encoding="utf-8"),
+            formatter=lambda s: s.to_json(indent=None) + "\n",
+        )
+
+    ratio = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+    provider = TracerProvider(
+        resource=Resource.create({"service.name": os.getenv("OTEL_SERVICE_NAME", "artium-backend")}),
+        sampler=ParentBased(TraceIdRatioBased(ratio)),
+    )
+    provider.add_span_processor(BatchSpanProcessor(exporter))
+    trace.set_tracer_provider(provider)
+    _configured = True
+
+
+def _tracer():
+    return trace.get_tracer("artium")
+
+
+def _clean(attributes: Dict[str, Any]) -> Dict[str, Any]:
+    return {key: value for key, value in attributes.items() if value is not None}
+
+
+@contextmanager
+def span(name: str, **attributes) -> Iterator[Optional[Any]]:
+    """Open a child span of the current trace; a no-op when tracing is unavailable."""
+    if trace is None:
+        yield None
+        return
+    with _tracer().start_as_current_span(name, attributes=_clean(attributes)) as current:
+        yield current
+
+
+@contextmanager
+def server_span(name: str, carrier: MutableMapping[str, str], **attributes) -> Iterator[Optional[Any]]:
+    """Open a request-level span, continuing any trace context found in `carrier`."""
+    if trace is None:
+        yield None
+        return
+    context = propagate.extract(carrier)
+    with _tracer().start_as_current_span(
+        name,
+        context=context,
+        kind=trace.SpanKind.SERVER,
+        attributes=_clean(attributes),
+    ) as current:
+        yield current
+
+
+def inject_trace_headers(headers: MutableMapping[str, str]) -> None:
+    """Add W3C traceparent/tracestate headers for an outgoing request."""
+    if trace is not None:
+        propagate.inject(headers)
+
+
+def current_trace_id() -> Optional[str]:
+    if trace is None:
+        return None
+    context = trace.get_current_span().get_span_context()
+    if not context.is_valid:
+        return None
+    return format(context.trace_id, "032x")
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Record each Mongo command as a client span under the active trace."""
+
+    def __init__(self):
+        self._spans = {}
+
+    def started(self, event):
+        if trace is None:
+            return
+        collection = event.command.get(event.command_name)
+        self._spans[(event.connection_id, event.request_id)] = _tracer().start_span(
+            f"mongo.{event.command_name}",
+            kind=trace.SpanKind.CLIENT,
+            attributes=_clean({
+                "db.system": "mongodb",
+                "db.name": event.database_name,
+                "db.operation": event.command_name,
+                "db.mongodb.collection": collection if isinstance(collection, str) else None,
+            }),
+        )
+
+    def succeeded(self, event):
+        current = self._spans.pop((event.connection_id, event.request_id), None)
+        if current is not None:
+            current.end()
+
+    def failed(self, event):
+        current = self._spans.pop((event.connection_id, event.request_id), None)
+        if current is not None:
+            current.set_status(trace.Status(trace.StatusCode.ERROR, str(event.failure)))
+            current.end()
@@ -0,0 +1,183 @@
+import hashlib
+import os
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from pymongo import UpdateOne
+
+from db import get_db
+
+load_dotenv()
+
+# 0 disables the corresponding limit.
+_DAILY_TOKEN_QUOTA = int(os.getenv("USAGE_DAILY_TOKEN_QUOTA", "0"))
+_MAX_CONCURRENT_CALLS = int(os.getenv("USAGE_MAX_CONCURRENT_CALLS", "2"))
+
+_inflight: Dict[str, int] = {}
+_inflight_lock = threading.Lock()
+
+
+def usage_subject(current_user: Optional[dict], api_key: str) -> str:
+    """
+    The primary subject for a caller (used to scope reports and idempotency
+    keys): the signed-in user when there is one, otherwise a fingerprint of
+    the supplied API key. Quotas use usage_subjects instead.
+    """
+    if current_user:
+        return f"user:{current_user['_id']}"
+    return _key_subject(api_key)
+
+
+def usage_subjects(current_user: Optional[dict], api_key: str) -> List[str]:
+    """
+    Every subject a Gemini call is admitted against and billed to: the
+    signed-in user (if any) and always the API-key fingerprint, so dropping
+    or spoiling the bearer token cannot open a fresh quota bucket.
+    """
+    subjects = [f"user:{current_user['_id']}"] if current_user else []
+    subjects.append(_key_subject(api_key))
+    return subjects
+
+
+def _key_subject(api_key: str) -> str:
+    fingerprint = hashlib.sha256(api_key.encode("utf-8")).hexdigest()[:16]
+    return f"key:{fingerprint}"
+
+
+def _day(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d")
+
+
+def _rollup_id(subject: str, day: str) -> str:
+    return f"{subject}:{day}"
+
+
+class UsageRecorder:
+    """
+    Writes one ledger entry per Gemini call and bumps the daily rollup of
+    every subject the call was admitted against.
+    """
+
+    def __init__(self, subjects: List[str], feature: str):
+        self.subjects = subjects
+        self.feature = feature
+
+    def record(self, usage_metadata: Optional[Dict[str, Any]], latency_ms: float, ok: bool = True) -> None:
+        metadata = usage_metadata or {}
+        prompt_tokens = int(metadata.get("promptTokenCount", 0))
+        candidate_tokens = int(metadata.get("candidatesTokenCount", 0))
+        total_tokens = int(metadata.get("totalTokenCount", prompt_tokens + candidate_tokens))
+        now = datetime.utcnow()
+        day = _day(now)
+
+        try:
+            db = get_db()
+            db.usage_events.insert_one({
+                "subject": self.subjects[0],
+                "subjects": self.subjects,
+                "feature": self.feature,
+                "promptTokens": prompt_tokens,
+                "candidateTokens": candidate_tokens,
+                "totalTokens": total_tokens,
+                "latencyMs": round(latency_ms, 1),
+                "ok": ok,
+                "createdAt": now,
+            })
+
+            feature = f"features.{self.feature}"
+            increments = {
+                "calls": 1,
+                "errors": 0 if ok else 1,
+                "promptTokens": prompt_tokens,
+                "candidateTokens": candidate_tokens,
+                "totalTokens": total_tokens,
+                "latencyMs": round(latency_ms, 1),
+                f"{feature}.calls": 1,
+                f"{feature}.totalTokens": total_tokens,
+            }
+            db.usage_daily.bulk_write(
+                [
+                    UpdateOne(
+                        {"_id": _rollup_id(subject, day)},
+                        {"$setOnInsert": {"subject": subject, "day": day}, "$inc": increments},
+                        upsert=True,
+                    )
+                    for subject in self.subjects
+                ],
+                ordered=False,
+            )
+        except Exception:
+            # Accounting must never fail the user's request.
+            pass
+
+
+def tokens_used_today(subject: str) -> int:
+    rollup = get_db().usage_daily.find_one(
+        {"_id": _rollup_id(subject, _day(datetime.utcnow()))},
+        {"totalTokens": 1},
+    )
+    return int(rollup.get("totalTokens", 0)) if rollup else 0
+
+
+@contextmanager
+def metered_gemini_call(subjects: List[str], feature: str) -> Iterator[UsageRecorder]:
+    """
+    Admit a Gemini call against every subject in `subjects` (see
+    usage_subjects), enforcing each one's concurrency limit and daily token
+    quota before any upstream request is made.
+    """
+    with _inflight_lock:
+        if _MAX_CONCURRENT_CALLS and any(_inflight.get(subject, 0) >= _MAX_CONCURRENT_CALLS for subject in subjects):
+            raise HTTPException(
+                status_code=429,
+                detail="Too many concurrent generation requests. Please wait for the current one to finish.",
+            )
+        for subject in subjects:
+            _inflight[subject] = _inflight.get(subject, 0) + 1
+
+    try:
+        if _DAILY_TOKEN_QUOTA and any(tokens_used_today(subject) >= _DAILY_TOKEN_QUOTA for subject in subjects):
+            raise HTTPException(status_code=429, detail="Daily token quota exceeded. Try again tomorrow.")
+        yield UsageRecorder(subjects, feature)
+    finally:
+        with _inflight_lock:
+            for subject in subjects:
+                remaining = _inflight.get(subject, 1) - 1
+                if remaining > 0:
+                    _inflight[subject] = remaining
+                else:
+                    _inflight.pop(subject, None)
+
+
+def get_usage_summary(subject: str, days: int = 30) -> Dict[str, Any]:
+    """
+    Return the daily rollups for the last `days` days plus today's quota state.
+    """
+    days = max(1, min(days, 366))
+    since = _day(datetime.utcnow() - timedelta(days=days - 1))
+    cursor = (
+        get_db().usage_daily
+        .find({"subject": subject, "day": {"$gte": since}}, {"_id": 0, "subject": 0})
+        .sort("day", -1)
+    )
+    daily = list(cursor)
+
+    used_today = daily[0]["totalTokens"] if daily and daily[0]["day"] == _day(datetime.utcnow()) else 0
+    return {
+        "daily": daily,
+        "totals": {
+            "calls": sum(d.get("calls", 0) for d in daily),
+            "promptTokens": sum(d.get("promptTokens", 0) for d in daily),
+            "candidateTokens": sum(d.get("candidateTokens", 0) for d in daily),
+            "totalTokens": sum(d.get("totalTokens", 0) for d in daily),
+        },
+        "quota": {
+            "dailyTokens": _DAILY_TOKEN_QUOTA or None,
+            "usedToday": used_today,
+            "maxConcurrentCalls": _MAX_CONCURRENT_CALLS or None,
+        },
+    }
@@ -145,9 +145,14 @@ function GeneratorPage({ editingArticle, onClearEdit }) {
         .map(t => t.trim())
         .filter(t => t.length > 0);
 
+      const headers = { 'Content-Type': 'application/json' };
+      if (token) {
+        headers.Authorization = `Bearer ${token}`;
+      }
+
       const response = await fetch(apiUrl('/api/generate'), {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers,
         body: JSON.stringify({
           title: formData.title,
           tone: formData.tone,
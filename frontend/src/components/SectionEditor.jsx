@@ -1,6 +1,7 @@
 import { useMemo, useState } from 'react';
 import { parseContentBlocks } from '../utils/articleFormatting';
 import { apiUrl } from '../utils/apiConfig';
+import { useAuth } from '../context/AuthContext';
 import './SectionEditor.css';
 
 const renderInlineSegments = (segments = []) =>
@@ -20,6 +21,7 @@ function SectionEditor({ section, apiKey, article, onUpdate }) {
   const [editedHeading, setEditedHeading] = useState(section.heading);
   const [isRegenerating, setIsRegenerating] = useState(false);
   const [error, setError] = useState(null);
+  const { token } = useAuth();
   const contentBlocks = useMemo(() => parseContentBlocks(section.content || ''), [section.content]);
 
   const handleSave = () => {
@@ -44,9 +46,14 @@ function SectionEditor({ section, apiKey, article, onUpdate }) {
     setIsRegenerating(true);
 
     try {
+      const headers = { 'Content-Type': 'application/json' };
+      if (token) {
+        headers.Authorization = `Bearer ${token}`;
+      }
+
       const response = await fetch(apiUrl('/api/section/regenerate'), {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
+        headers,
         body: JSON.stringify({
           article,
           sectionId: section.id,